@@ -1,10 +1,10 @@
 import chess
-import chess.engine
-import chess.pgn
 import time
 import random
 
 VALUES = [100, 350, 351, 500, 1000, 0]
+MATE = 10000
+MAX_PLY = 1000  # scores within MAX_PLY of MATE are mate scores
 PIECES = range(1, 7)
 MINOR_ROOK = range(2, 5)  # minor piece or rook
 CENTER = chess.SquareSet([27, 28, 35, 36])
@@ -127,9 +127,9 @@ class Board:
 
     def eval(self):
         if self.board.result() == '1-0':
-            return 10000
+            return MATE
         elif self.board.result() == '0-1':
-            return -10000
+            return -MATE
         elif self.board.result() == '1/2-1/2':
             return 0
         if end_game(self.board):
@@ -144,7 +144,12 @@ class Board:
             return -self.eval()
 
     def set_fen(self, fen):
-        return
+        self.board.set_fen(fen)
+        self.mat = material(self.board)
+        self.mat_stack = []
+
+        self.non_ray_space = non_ray_space(self.board)
+        self.non_ray_stack = []
 
 
 def value(piece_type):
@@ -192,6 +197,15 @@ def material(board):
     return white_material - black_material
 
 
+# pawn and knight attacks into the enemy half, as tracked incrementally by Board.push.
+def non_ray_space(board):
+    white_space = sum(len(board.attacks(square) & BLACK_SIDE)
+                      for square in board.pieces(chess.PAWN, chess.WHITE) | board.pieces(chess.KNIGHT, chess.WHITE))
+    black_space = sum(len(board.attacks(square) & WHITE_SIDE)
+                      for square in board.pieces(chess.PAWN, chess.BLACK) | board.pieces(chess.KNIGHT, chess.BLACK))
+    return 3 * (white_space - black_space)
+
+
 def king_activity(board):
     w_king = board.king(chess.WHITE)
     b_king = board.king(chess.BLACK)
@@ -265,10 +279,22 @@ def flipped_eval(board):
         return -eval(board)
 
 
+def is_mate_score(score):
+    return abs(score) >= MATE - MAX_PLY
+
+
+# moves until mate, negative if the side to move is getting mated.
+def mate_in(score):
+    if score > 0:
+        return (MATE - score + 1) // 2
+    else:
+        return -(MATE + score) // 2
+
+
 # get list of possible moves sorted best to worst.
 def root_move(board, depth, prev_best_move, prev_moves, thinking, nodes):
-    alpha = -10000
-    beta = 10000
+    alpha = -MATE
+    beta = MATE
     nodes[0] += 1
 
     if len(prev_moves) != 0:
@@ -294,12 +320,12 @@ def root_move(board, depth, prev_best_move, prev_moves, thinking, nodes):
         #score = -ab_search(board, depth, -beta, -alpha, thinking)
         if set_zero:
             score = -ab_search(board, depth, -
-                               (alpha+1), -alpha, thinking, nodes, zero=True)
+                               (alpha+1), -alpha, thinking, nodes, zero=True, ply=1)
             if score > alpha:
                 score = -ab_search(board, depth, -beta, -
-                                   alpha, thinking, nodes)
+                                   alpha, thinking, nodes, ply=1)
         else:
-            score = -ab_search(board, depth, -beta, -alpha, thinking, nodes)
+            score = -ab_search(board, depth, -beta, -alpha, thinking, nodes, ply=1)
             set_zero = True
         board.pop()
 
@@ -317,16 +343,23 @@ def root_move(board, depth, prev_best_move, prev_moves, thinking, nodes):
     return best_move
 
 
-def ab_search(board, depth, alpha, beta, thinking, nodes, zero=False):
+# ply is the distance from the root, mates found closer to the root score higher.
+def ab_search(board, depth, alpha, beta, thinking, nodes, zero=False, ply=0):
     nodes[0] += 1
     if depth <= 0 or board.board.is_game_over():
-        return quiesce(board, alpha, beta, thinking, nodes)
+        return quiesce(board, alpha, beta, thinking, nodes, ply)
+
+    # mate distance pruning: no line from here beats a shorter mate already found.
+    alpha = max(alpha, -MATE + ply)
+    beta = min(beta, MATE - ply - 1)
+    if alpha >= beta:
+        return alpha
 
     moves = list(board.board.legal_moves)
     moves.sort(key=lambda move: quiesce_order_key(move, board))
     set_zero = False
 
-    score = -10000
+    score = -MATE
     for move in moves:
         board.push(move)
 
@@ -339,16 +372,16 @@ def ab_search(board, depth, alpha, beta, thinking, nodes, zero=False):
 
         if zero:
             score = max(score, -ab_search(board, subdepth,
-                                          -beta, -alpha, thinking, nodes, zero=True))
+                                          -beta, -alpha, thinking, nodes, zero=True, ply=ply+1))
         elif set_zero:
             test_score = -ab_search(board, subdepth, -
-                                    (alpha+1), -alpha, thinking, nodes, zero=True)
+                                    (alpha+1), -alpha, thinking, nodes, zero=True, ply=ply+1)
             if test_score > alpha:
                 score = max(score, -ab_search(board,
-                                              subdepth, -beta, -alpha, thinking, nodes))
+                                              subdepth, -beta, -alpha, thinking, nodes, ply=ply+1))
         else:
             score = max(score, -ab_search(board,
-                                          subdepth, -beta, -alpha, thinking, nodes))
+                                          subdepth, -beta, -alpha, thinking, nodes, ply=ply+1))
             set_zero = True
 
         board.pop()
@@ -363,8 +396,10 @@ def ab_search(board, depth, alpha, beta, thinking, nodes, zero=False):
     return score
 
 
-def quiesce(board, alpha, beta, thinking, nodes):
+def quiesce(board, alpha, beta, thinking, nodes, ply=0):
     nodes[0] += 1
+    if board.board.is_checkmate():
+        return -MATE + ply
     baseline = board.flipped_eval()
     if board.board.is_game_over():
         return baseline
@@ -385,7 +420,7 @@ def quiesce(board, alpha, beta, thinking, nodes):
     score = baseline
     for move in moves:
         board.push(move)
-        score = max(score, -quiesce(board, -beta, -alpha, thinking, nodes))
+        score = max(score, -quiesce(board, -beta, -alpha, thinking, nodes, ply+1))
         board.pop()
         if score >= beta:
             return score
@@ -417,11 +452,69 @@ def quiesce_order_key(move, board):
 
 def move_order_key(move, board):
     board.push(move)
-    score = -quiesce(board, -10000, 10000, [True], [0])
+    score = -quiesce(board, -MATE, MATE, [True], [0], 1)
     board.pop()
     return -score
 
 
+# search for a forced mate in at most n moves, trying checks and captures first.
+# returns the first move of the shortest mate and its length, or None, None.
+def mate_search(board, n, thinking, nodes):
+    for moves in range(1, n + 1):
+        move = mate_attack(board, moves, thinking, nodes)
+        if move:
+            return move, moves
+        if not thinking[0]:
+            break
+    return None, None
+
+
+def mate_attack(board, n, thinking, nodes):
+    nodes[0] += 1
+    if n == 1:  # only a check can mate on the last move, order doesn't matter
+        moves = [move for move in board.legal_moves if board.gives_check(move)]
+    else:
+        moves = list(board.legal_moves)
+        moves.sort(key=lambda move: mate_order_key(move, board))
+
+    for move in moves:
+        board.push(move)
+        mated = mate_defend(board, n, thinking, nodes)
+        board.pop()
+        if mated:
+            return move
+        if not thinking[0]:
+            return None
+    return None
+
+
+def mate_defend(board, n, thinking, nodes):
+    nodes[0] += 1
+    if board.is_checkmate():
+        return True
+    elif n == 1 or board.is_game_over():
+        return False
+
+    for move in board.legal_moves:
+        board.push(move)
+        escaped = mate_attack(board, n - 1, thinking, nodes) is None
+        board.pop()
+        if escaped:
+            return False
+    return True
+
+
+def mate_order_key(move, board):
+    if board.gives_check(move):
+        return -1000
+    elif board.is_capture(move):
+        return -value(board.piece_type_at(move.to_square))
+    elif move.promotion:
+        return -value(move.promotion)
+    else:
+        return 0
+
+
 def eval_order_key(move, board):
     board.push(move)
     score = -board.flipped_eval()
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import time
+import chess
+import chess.polyglot
+
+MAX_ENTRIES = 1000000
+TIMEOUT = 0.05  # seconds to wait on another process holding the write lock
+
+
+# sqlite stores signed 64 bit integers, zobrist hashes are unsigned.
+def key(board):
+    h = chess.polyglot.zobrist_hash(board)
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+class Entry:
+    def __init__(self, move, score, depth, pv):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.pv = pv
+
+
+# On-disk analysis cache shared across sessions and processes. Positions are
+# keyed by zobrist hash and the least recently used rows are evicted past
+# max_entries.
+class Cache:
+    def __init__(self, path, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            path, timeout=TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS positions ('
+                          'key INTEGER PRIMARY KEY, move TEXT, score INTEGER, '
+                          'depth INTEGER, pv TEXT, used INTEGER)')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS positions_used ON positions (used)')
+
+    # rows can be added by other processes, so always count them.
+    def size(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def lookup(self, board):
+        with self.lock:
+            row = self.conn.execute('SELECT move, score, depth, pv FROM positions WHERE key = ?',
+                                    (key(board),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            move = chess.Move.from_uci(row[0])
+            if move not in board.legal_moves:  # hash collision
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute('UPDATE positions SET used = ? WHERE key = ?',
+                              (time.time(), key(board)))
+            pv = [chess.Move.from_uci(uci) for uci in row[3].split()]
+            return Entry(move, row[1], row[2], pv)
+
+    # shallower results never overwrite deeper ones.
+    def store(self, board, move, score, depth, pv=None):
+        pv = ' '.join(m.uci() for m in (pv or [move]))
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute('SELECT depth FROM positions WHERE key = ?',
+                                        (key(board),)).fetchone()
+                if row is None or row[0] <= depth:
+                    self.conn.execute('INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?, ?)',
+                                      (key(board), move.uci(), score, depth, pv, time.time()))
+                    size = self.conn.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+                    if size > self.max_entries:
+                        self.conn.execute('DELETE FROM positions WHERE key IN '
+                                          '(SELECT key FROM positions ORDER BY used LIMIT ?)',
+                                          (size - self.max_entries,))
+                self.conn.execute('COMMIT')
+            except sqlite3.Error:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM positions')
+            self.hits = 0
+            self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return 'cache entries {} hits {} misses {} hitrate {:.2f}'.format(
+            self.size(), self.hits, self.misses, self.hit_rate())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,4 +1,15 @@
-from distutils.core import setup
-import py2exe
+import sys
 
-setup(console=['uci.py'])
+if sys.platform == 'win32':
+    from distutils.core import setup
+    import py2exe
+
+    setup(console=['uci.py'])
+else:
+    from setuptools import setup
+
+    setup(name='py-blob',
+          version='0.1',
+          py_modules=['ai', 'cache', 'uci'],
+          install_requires=['chess'],
+          entry_points={'console_scripts': ['py-blob = uci:main']})
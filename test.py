@@ -1,5 +1,12 @@
 import chess
 import ai
+import cache
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 
 positions = [
     '2k2b2/1p1n4/3p4/8/1P6/3P4/5P2/R2K4 w - - 0 1',
@@ -8,6 +15,9 @@ positions = [
     '2k2b2/1p2pp1q/3p4/8/1P1PP3/3P4/5P2/3K2N1 w - - 0 1'
 ]
 
+STARTUP_BUDGET = 0.5  # seconds from launch to uciok
+STARTUP_TIMEOUT = 10
+
 
 def test_end_game():
     board = chess.Board()
@@ -121,6 +131,94 @@ def test_push():
     assert board.space() == 0, board.space()
 
 
+def test_set_fen():
+    board = ai.Board(chess.Board())
+    for move in ['e2e4', 'e7e5', 'g1f3', 'g8f6', 'f3e5', 'f8c5', 'e5f7']:
+        board.push(chess.Move.from_uci(move))
+    fen_board = ai.Board(chess.Board())
+    fen_board.set_fen(board.board.fen())
+    assert fen_board.mat == board.mat == 200, fen_board.mat
+    assert fen_board.space() == board.space(), fen_board.space()
+    fen_board.push(chess.Move.from_uci('e8f7'))
+    fen_board.pop()
+    assert fen_board.space() == board.space(), fen_board.space()
+
+
+def test_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.db')
+        board = chess.Board()
+        c = cache.Cache(path, max_entries=2)
+        try:
+            assert c.lookup(board) is None
+            c.store(board, chess.Move.from_uci('e2e4'), 30, 3)
+            c.store(board, chess.Move.from_uci('d2d4'), 10, 1)  # shallower, ignored
+        finally:
+            c.close()
+
+        c = cache.Cache(path, max_entries=2)  # closed before the directory is removed
+        try:
+            entry = c.lookup(board)
+            assert entry.move == chess.Move.from_uci('e2e4'), entry.move
+            assert entry.score == 30 and entry.depth == 3
+            assert c.hit_rate() == 1.0, c.hit_rate()
+            time.sleep(0.05)  # rows are ordered by last use time
+
+            board.push_uci('e2e4')
+            c.store(board, chess.Move.from_uci('e7e5'), 0, 2)
+            board.push_uci('e7e5')
+            c.store(board, chess.Move.from_uci('g1f3'), 20, 2)  # evicts oldest
+            assert c.size() == 2, c.size()
+            board.reset()
+            assert c.lookup(board) is None
+
+            c.clear()
+            assert c.size() == 0 and c.hits == 0
+        finally:
+            c.close()
+
+
+def test_startup():
+    start = time.time()
+    engine = subprocess.Popen([sys.executable, 'uci.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
+    killer = threading.Timer(STARTUP_TIMEOUT, engine.kill)  # a stalled engine hits eof
+    killer.start()
+    engine.stdin.write('uci\n')
+    engine.stdin.flush()
+    line = engine.stdout.readline()
+    while line and line.strip() != 'uciok':
+        line = engine.stdout.readline()
+    elapsed = time.time() - start
+    killer.cancel()
+    assert line, 'engine exited or stalled before uciok'
+    engine.stdin.write('quit\n')
+    engine.stdin.flush()
+    engine.wait(timeout=STARTUP_TIMEOUT)
+    assert elapsed < STARTUP_BUDGET, elapsed
+
+
+def test_mate_scores():
+    assert ai.mate_in(ai.MATE - 1) == 1
+    assert ai.mate_in(ai.MATE - 3) == 2
+    assert ai.mate_in(-ai.MATE + 2) == -1
+    assert not ai.is_mate_score(1000)
+
+    board = ai.Board(chess.Board('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'))
+    moves = []
+    best_move = ai.root_move(board, 2, None, moves, [True], [0])
+    assert best_move == chess.Move.from_uci('a1a8'), best_move
+    assert dict(moves)[best_move] == ai.MATE - 1, dict(moves)[best_move]
+
+
+def test_mate_search():
+    board = chess.Board('r1b2k1r/ppp1bppp/8/1B1Q4/5q2/2P5/PPP2PPP/R3R1K1 w - - 1 1')
+    assert ai.mate_search(board, 1, [True], [0]) == (None, None)
+    move, moves = ai.mate_search(board, 3, [True], [0])
+    assert move == chess.Move.from_uci('d5d8') and moves == 2, (move, moves)
+    assert board.fen() == 'r1b2k1r/ppp1bppp/8/1B1Q4/5q2/2P5/PPP2PPP/R3R1K1 w - - 1 1'
+
+
 def main():
     # test_end_game()
     # test_mobility()
@@ -128,6 +226,11 @@ def main():
     # test_king_activity()
     test_push()
     test_kingsafety()
+    test_set_fen()
+    test_cache()
+    test_startup()
+    test_mate_scores()
+    test_mate_search()
     print('good')
 
 
@@ -11,22 +11,74 @@ class Interface:
         self.search_thread = None
         self.wait_thread = None
         self.board = ai.Board()
+        self.cache = None
+        self.max_depth = None
+        self.mate_moves = None
 
     def think(self):
+        if self.mate_moves:
+            self.think_mate()
+            return
+
         best_move = None
         move_list = []
         depth = 0
         nodes = [0]
         start = time.time()
-        while self.thinking[0]:
-            print(nodes[0])
+
+        if self.cache:
+            entry = self.use_cache(self.cache.lookup, self.board.board)
+            if entry:
+                print('info depth {} score {} pv {}'.format(
+                    entry.depth, uci_score(entry.score), ' '.join(move.uci() for move in entry.pv)), flush=True)
+                best_move = entry.move
+                depth = entry.depth  # cached move seeds the ordering
+
+        # root_move(depth) searches depth + 1 plies, which is what uci reports.
+        while self.thinking[0] and (self.max_depth is None or depth < self.max_depth):
             best_move = ai.root_move(
                 self.board, depth, best_move, move_list, self.thinking, nodes)
+            if self.thinking[0]:
+                score = dict(move_list)[best_move]
+                print('info depth {} score {} nodes {} pv {}'.format(
+                    depth + 1, uci_score(score), nodes[0], best_move.uci()), flush=True)
+                if self.cache:  # mate scores are relative to this position so are safe to store
+                    self.use_cache(self.cache.store, self.board.board, best_move, score, depth + 1)
             depth += 1
+        self.thinking[0] = False
         self.stop_timer = True
 
+        stats = self.use_cache(self.cache.stats) if self.cache else None
+        if stats:
+            print('info string ' + stats, flush=True)
+
         print('bestmove ' + best_move.uci(), flush=True)
-        print('nodes/sec ' + str(nodes[0]/(time.time()-start)), flush=True)
+        print_speed(nodes[0], start)
+
+    # the cache is only an optimization, a locked or broken file must not stop the search.
+    def use_cache(self, method, *args):
+        import sqlite3
+        try:
+            return method(*args)
+        except sqlite3.Error as e:
+            print('info string cache unavailable: ' + str(e), flush=True)
+            return None
+
+    def think_mate(self):
+        nodes = [0]
+        start = time.time()
+        best_move, moves = ai.mate_search(
+            self.board.board, self.mate_moves, self.thinking, nodes)
+        if best_move:
+            print('info score mate {} nodes {} pv {}'.format(
+                moves, nodes[0], best_move.uci()), flush=True)
+        else:  # no mate found, fall back to a shallow search
+            best_move = ai.root_move(self.board, 0, None, [], [True], nodes)
+        self.thinking[0] = False
+        self.stop_timer = True
+
+        print('bestmove ' + best_move.uci(), flush=True)
+        print_speed(nodes[0], start)
 
     def wait(self, wait_time):
         start_time = time.time()
@@ -37,21 +89,21 @@ class Interface:
         self.thinking[0] = False
 
     def setup(self, tokens):
+        moves = tokens.index('moves') if 'moves' in tokens else len(tokens)
         if tokens[1] == 'fen':
-            fen = ''.join([str(token)+' ' for token in tokens[2:]])
+            fen = ''.join([str(token)+' ' for token in tokens[2:moves]])
             self.board.set_fen(fen)
         elif tokens[1] == 'startpos':
             self.board.reset()
-            if len(tokens) > 3 and tokens[2] == 'moves':
-                for move in tokens[3:]:
-                    self.board.push(chess.Move.from_uci(move))
+        for move in tokens[moves + 1:]:
+            self.board.push(chess.Move.from_uci(move))
 
     def start_thinking(self, wait_time):
         self.thinking[0] = True
+        self.stop_timer = False
         self.search_thread = threading.Thread(target=self.think)
         self.search_thread.start()
 
-        self.stop_timer = False
         self.wait_thread = threading.Thread(
             target=self.wait, args=(wait_time,))
         self.wait_thread.start()
@@ -74,22 +126,66 @@ class Interface:
             think_time = int(tokens[tokens.index('btime') + 1])/20
         else:
             think_time = 10000000000
+        if 'depth' in tokens:
+            self.max_depth = max(1, int(tokens[tokens.index('depth') + 1]))
+        else:
+            self.max_depth = None
+        if 'mate' in tokens:
+            self.mate_moves = int(tokens[tokens.index('mate') + 1])
+        else:
+            self.mate_moves = None
         self.start_thinking(think_time)
 
+    def set_option(self, tokens):
+        if 'value' in tokens:
+            name = ' '.join(tokens[tokens.index('name') + 1:tokens.index('value')])
+            value = ' '.join(tokens[tokens.index('value') + 1:])
+        else:
+            name = ' '.join(tokens[tokens.index('name') + 1:])
+            value = None
+
+        if name.lower() == 'cache':
+            import cache  # sqlite and polyglot only load when the cache is used
+            import sqlite3
+            if self.cache:
+                self.cache.close()
+            self.cache = None
+            if value and value != '<empty>':
+                try:
+                    self.cache = cache.Cache(value)
+                except (sqlite3.Error, OSError) as e:
+                    print('info string cache unavailable: ' + str(e), flush=True)
+        elif name.lower() == 'clear cache' and self.cache:
+            self.use_cache(self.cache.clear)
+
     def listen(self):
         while True:
             tokens = input().split(' ')
             if tokens[0] == 'uci':
-                print('id name py-blob')
-                print('id author Nicholas Buoncristiani Jerome Wei')
-                print('uciok')
+                print('id name py-blob', flush=True)
+                print('id author Nicholas Buoncristiani Jerome Wei', flush=True)
+                print('option name Cache type string default <empty>', flush=True)
+                print('option name Clear Cache type button', flush=True)
+                print('uciok', flush=True)
             elif tokens[0] == 'isready':
-                print('readyok')
+                print('readyok', flush=True)
             elif tokens[0] == 'ucinewgame':
                 self.stop_thinking()
                 self.board.reset()
+            elif tokens[0] == 'setoption':
+                self.set_option(tokens)
+            elif tokens[0] == 'clearcache':
+                if self.cache:
+                    self.use_cache(self.cache.clear)
+            elif tokens[0] == 'cachestats':
+                stats = self.use_cache(self.cache.stats) if self.cache else None
+                if stats:
+                    print('info string ' + stats, flush=True)
             elif tokens[0] == 'position':
-                self.setup(tokens)
+                try:
+                    self.setup(tokens)
+                except Exception as e:
+                    print(e)
             elif tokens[0] == 'stop':
                 self.stop_thinking()
             elif tokens[0] == 'go':
@@ -99,9 +195,25 @@ class Interface:
                     print(e)
             elif tokens[0] == 'quit':
                 self.stop_thinking()
+                if self.cache:
+                    self.cache.close()
                 return
 
 
+# a search answered from the cache takes no time, and windows clocks tick every ~15ms.
+def print_speed(nodes, start):
+    elapsed = time.time() - start
+    if nodes and elapsed > 0:
+        print('nodes/sec ' + str(nodes/elapsed), flush=True)
+
+
+def uci_score(score):
+    if ai.is_mate_score(score):
+        return 'mate {}'.format(ai.mate_in(score))
+    else:
+        return 'cp {}'.format(score)
+
+
 def main():
     a = Interface()
     a.listen()